@@ -1,30 +1,78 @@
 #!/usr/bin/env python3
 """Generate app icons for Julius by rendering the SVG logo to PNG/ICO/ICNS."""
 
+import hashlib
 import io
+import os
+import re
 import struct
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-import cairosvg
 from PIL import Image, ImageDraw
 
 ROOT = Path(__file__).parent.parent
 SVG_PATH = ROOT / "src" / "renderer" / "src" / "assets" / "logo.svg"
 RESOURCES = ROOT / "resources"
+CACHE_DIR = ROOT / ".cache" / "icons"
 
 ICON_SIZE = 512
 BG_COLOR = (42, 36, 32, 255)
 BG_RADIUS_RATIO = 12 / 64  # from original 64x64 design space
 BG_PAD_RATIO = 4 / 64
+# Leading number of an SVG length/viewBox field ("64", "64px", "-1.5e2")
+_SVG_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
 
 
-def render_svg_to_png(svg_path: Path, size: int) -> Image.Image:
-    """Render an SVG file to a Pillow Image at the given size."""
+def svg_aspect(svg_text: str) -> float:
+    """Return the width/height ratio of an SVG from its root viewBox or size attributes."""
+    root = re.search(r"<svg\b[^>]*>", svg_text)
+    attrs = dict(re.findall(r'([\w:-]+)\s*=\s*"([^"]*)"', root.group(0))) if root else {}
+
+    view_box = re.findall(_SVG_NUMBER, attrs.get("viewBox", ""))
+    if len(view_box) == 4 and float(view_box[2]) > 0 and float(view_box[3]) > 0:
+        return float(view_box[2]) / float(view_box[3])
+
+    width = re.match(_SVG_NUMBER, attrs.get("width", ""))
+    height = re.match(_SVG_NUMBER, attrs.get("height", ""))
+    if width and height and float(width.group(0)) > 0 and float(height.group(0)) > 0:
+        return float(width.group(0)) / float(height.group(0))
+    return 1.0
+
+
+def render_svg_to_png(svg_data: bytes, width: int, height: int) -> Image.Image:
+    """Render SVG source to a Pillow Image at the given size.
+
+    Rasterizations are cached by SVG content hash, so repeat runs with an
+    unchanged logo skip cairosvg entirely.
+    """
+    key = hashlib.sha256(svg_data).hexdigest()
+    cached = CACHE_DIR / f"{key}-{width}x{height}.png"
+    if cached.exists():
+        try:
+            return Image.open(cached).convert("RGBA")
+        except OSError:
+            pass  # unreadable cache entry; re-render and overwrite it
+
+    # Imported lazily: loading cairo/fontconfig dominates startup on cache hits
+    import cairosvg
+
     png_data = cairosvg.svg2png(
-        url=str(svg_path),
-        output_width=size,
-        output_height=size,
+        bytestring=svg_data,
+        output_width=width,
+        output_height=height,
     )
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Write then rename so an interrupted run never leaves a partial entry
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(png_data)
+        os.replace(tmp, cached)
+    except BaseException:
+        os.unlink(tmp)
+        raise
     return Image.open(io.BytesIO(png_data)).convert("RGBA")
 
 
@@ -42,46 +90,74 @@ def make_icon(size: int) -> Image.Image:
         fill=BG_COLOR,
     )
 
-    # Render SVG at high res, crop to content, scale to fit, center
-    snake = render_svg_to_png(SVG_PATH, size * 2)
+    # Render SVG at its final size, crop to content, center
+    max_dim = int(size * 0.82)
+    svg_data = SVG_PATH.read_bytes()
+    aspect = svg_aspect(svg_data.decode("utf-8"))
+    if aspect >= 1:
+        target_w, target_h = max_dim, int(max_dim / aspect)
+    else:
+        target_w, target_h = int(max_dim * aspect), max_dim
+    snake = render_svg_to_png(svg_data, target_w, target_h)
     bbox = snake.getbbox()
     if bbox:
+        # Content is smaller than the viewBox; re-render so it fills max_dim
+        scale = min(max_dim / (bbox[2] - bbox[0]), max_dim / (bbox[3] - bbox[1]))
+        if scale > 1:
+            target_w, target_h = round(target_w * scale), round(target_h * scale)
+            snake = render_svg_to_png(svg_data, target_w, target_h)
+            bbox = snake.getbbox()
         cropped = snake.crop(bbox)
-        cw, ch = cropped.size
-
-        # Fit within 82% of icon size
-        max_dim = int(size * 0.82)
-        scale = min(max_dim / cw, max_dim / ch)
-        new_w, new_h = int(cw * scale), int(ch * scale)
-        snake_scaled = cropped.resize((new_w, new_h), Image.LANCZOS)
 
-        ox = (size - new_w) // 2
-        oy = (size - new_h) // 2
-        img.paste(snake_scaled, (ox, oy), snake_scaled)
+        ox = (size - cropped.width) // 2
+        oy = (size - cropped.height) // 2
+        img.alpha_composite(cropped, dest=(ox, oy))
 
     return img
 
 
-def create_ico(png_path: Path, ico_path: Path) -> None:
-    """Create a multi-size ICO file from a PNG."""
-    img = Image.open(png_path)
+def build_pyramid(img: Image.Image, min_size: int = 16) -> dict[int, Image.Image]:
+    """Halve the master image repeatedly, each level resized from the previous one."""
+    levels = {img.width: img}
+    sz = img.width
+    while sz // 2 >= min_size:
+        levels[sz // 2] = levels[sz].resize((sz // 2, sz // 2), Image.LANCZOS)
+        sz //= 2
+    return levels
+
+
+def create_ico(levels: dict[int, Image.Image], ico_path: Path) -> None:
+    """Create a multi-size ICO file from the icon pyramid."""
+    ico_levels = {sz: levels[sz] for sz in (64, 128, 256)}
+    ico_levels[48] = levels[64].resize((48, 48), Image.LANCZOS)
+    # LANCZOS buys nothing visible at the smallest sizes; bilinear is cheaper
+    ico_levels[32] = levels[64].resize((32, 32), Image.BILINEAR)
+    ico_levels[16] = ico_levels[32].resize((16, 16), Image.BILINEAR)
     sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
-    img.save(str(ico_path), format="ICO", sizes=sizes)
+    # PIL skips sizes larger than the primary image, so lead with the largest
+    frames = [ico_levels[sz] for sz, _ in reversed(sizes)]
+    frames[0].save(str(ico_path), format="ICO", sizes=sizes, append_images=frames[1:])
 
 
-def create_icns(png_path: Path, icns_path: Path) -> None:
-    """Create an ICNS file from a PNG using raw struct packing."""
-    img = Image.open(png_path)
+def create_icns(levels: dict[int, Image.Image], icns_path: Path) -> None:
+    """Create an ICNS file from the icon pyramid using raw struct packing."""
     icon_types = [
         (b"icp4", 16), (b"icp5", 32), (b"icp6", 64),
         (b"ic07", 128), (b"ic08", 256), (b"ic09", 512),
     ]
-    entries = []
-    for type_code, sz in icon_types:
-        resized = img.resize((sz, sz), Image.LANCZOS)
+
+    def encode(item: tuple[bytes, int]) -> tuple[bytes, bytes]:
+        type_code, sz = item
         buf = io.BytesIO()
-        resized.save(buf, format="PNG")
-        png_data = buf.getvalue()
+        levels[sz].save(buf, format="PNG", optimize=False, compress_level=6)
+        return type_code, buf.getvalue()
+
+    # zlib releases the GIL, so the PNG encodes run in parallel
+    with ThreadPoolExecutor(max_workers=len(icon_types)) as ex:
+        encoded = list(ex.map(encode, icon_types))
+
+    entries = []
+    for type_code, png_data in encoded:
         entries.append(type_code + struct.pack(">I", 8 + len(png_data)) + png_data)
     body = b"".join(entries)
     icns_data = b"icns" + struct.pack(">I", 8 + len(body)) + body
@@ -94,18 +170,20 @@ def main() -> None:
     print(f"Rendering SVG: {SVG_PATH}")
     print("Generating 512x512 icon PNG...")
     icon = make_icon(ICON_SIZE)
-    png_path = RESOURCES / "icon.png"
-    icon.save(str(png_path), "PNG")
-    print(f"  Saved {png_path}")
+    levels = build_pyramid(icon)
 
     print("Generating ICO...")
-    create_ico(png_path, RESOURCES / "icon.ico")
+    create_ico(levels, RESOURCES / "icon.ico")
     print("  Saved icon.ico")
 
     print("Generating ICNS...")
-    create_icns(png_path, RESOURCES / "icon.icns")
+    create_icns(levels, RESOURCES / "icon.icns")
     print("  Saved icon.icns")
 
+    png_path = RESOURCES / "icon.png"
+    icon.save(str(png_path), "PNG")
+    print(f"  Saved {png_path}")
+
     print("Done!")
 
 